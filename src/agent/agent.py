@@ -1,6 +1,6 @@
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain.prompts import PromptTemplate
-from src.agent.tools import  temporal_aware_search, hybrid_search
+from src.agent.tools import  temporal_aware_search, hybrid_search, community_overview, graph_expansion
 from src.agent.singleton_connection import get_connector
 from src.config.safe_llm import SafeLLM
 
@@ -13,6 +13,8 @@ Use one or many of: [{tool_names}]
 Tool Requirements:
 - `hybrid_search`: Required: {{"query": "<search topic>", "limit": <number>}}. Optional: other parameters.
 - `temporal_aware_search`: Required: {{"query": "<topic>", "reference_time": "<YYYY-MM-DD>", "limit": <number>}}. Optional: other parameters.
+- `community_overview`: Required: {{"topic": "<entity or theme>", "limit": <number>}}.
+- `graph_expansion`: Required: {{"query": "<seed entities>", "hops": <1-3>}}. Optional: "reference_time": "<YYYY-MM-DD>", "limit": <number>.
 
 Use this format:
 Question: the input question to answer
@@ -26,6 +28,8 @@ Final Answer: answer based on Observations
 Rules:
 - Use `hybrid_search` for most questions.
 - Use `temporal_aware_search` for questions with dates (e.g., "in 2023").
+- Use `community_overview` first for broad or overview questions (e.g., "give me an overview of TechNova").
+- Use `graph_expansion` for relationship chains (e.g., "who reports to the founder of X"); one call covers several hops.
 - No inventing; use only Observations.
 - Action Input: JSON like {{"key": "value"}}.
 
@@ -49,7 +53,7 @@ def create_graphiti_agent() -> AgentExecutor:
     graphiti_connector = get_connector()
 
     # Define las herramientas
-    tools = [temporal_aware_search, hybrid_search]
+    tools = [temporal_aware_search, hybrid_search, community_overview, graph_expansion]
     
     # Crea el prompt template
     prompt = PromptTemplate(
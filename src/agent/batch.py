@@ -0,0 +1,219 @@
+"""
+Modo batch del agente: responde un set de preguntas desde un JSONL con concurrencia
+acotada y genera un reporte de latencias (p50/p95/p99).
+
+Uso:
+    python -m src.agent.batch data/questions.jsonl --output data/output/batch_answers.jsonl \
+        --concurrency 4 --max-p95 20
+
+Cada línea del archivo de entrada es un objeto JSON con la pregunta en el campo
+`question` (configurable con --field). Si la línea trae `id` o `request_id` se copia
+al resultado. Con --max-p95 el proceso termina con código 1 si el p95 supera el umbral,
+para usarlo como gate de regresión de latencia en cada release.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from src.agent.agent import create_graphiti_agent
+
+load_dotenv()
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Acumula los tokens consumidos por las llamadas al LLM de una pregunta"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+
+    def on_llm_end(self, response, **kwargs):
+        self.llm_calls += 1
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage:
+            # Los chat models recientes reportan el uso en el mensaje
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    usage = {
+                        "prompt_tokens": usage.get("prompt_tokens", 0) + metadata.get("input_tokens", 0),
+                        "completion_tokens": usage.get("completion_tokens", 0) + metadata.get("output_tokens", 0),
+                    }
+        self.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+        self.completion_tokens += usage.get("completion_tokens", 0) or 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "llm_calls": self.llm_calls,
+        }
+
+
+def load_questions(input_path: Path, field: str = "question") -> List[Dict]:
+    """Lee las preguntas del JSONL, ignorando líneas vacías"""
+    questions = []
+    with open(input_path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if field not in record:
+                raise ValueError(f"Línea {line_number}: falta el campo '{field}'.")
+            questions.append({
+                "id": record.get("id") or record.get("request_id") or line_number,
+                "question": record[field],
+            })
+    return questions
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil con interpolación lineal entre rangos"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def _serialize_steps(intermediate_steps) -> List[Dict]:
+    steps = []
+    for action, observation in intermediate_steps:
+        steps.append({
+            "tool": getattr(action, "tool", None),
+            "tool_input": getattr(action, "tool_input", None),
+            "observation": str(observation),
+        })
+    return steps
+
+
+async def answer_question(agent_executor, item: Dict, semaphore: asyncio.Semaphore) -> Dict:
+    """Ejecuta una pregunta en el agente y mide latencia, herramientas y tokens"""
+    async with semaphore:
+        usage = TokenUsageHandler()
+        start = time.perf_counter()
+        result = {"id": item["id"], "question": item["question"]}
+        try:
+            response = await agent_executor.ainvoke(
+                {"input": item["question"]},
+                config={"callbacks": [usage]}
+            )
+            steps = _serialize_steps(response.get("intermediate_steps", []))
+            # handle_parsing_errors=True agrega pasos "_Exception" por salidas no parseables del LLM
+            parse_errors = sum(1 for step in steps if step["tool"] == "_Exception")
+            result.update({
+                "answer": response.get("output"),
+                "intermediate_steps": steps,
+                "tool_calls": len(steps) - parse_errors,
+                "parse_errors": parse_errors,
+                "error": None,
+            })
+        except Exception as e:
+            result.update({
+                "answer": None, "intermediate_steps": [], "tool_calls": 0, "parse_errors": 0, "error": str(e)
+            })
+        result["latency_s"] = round(time.perf_counter() - start, 3)
+        result["token_usage"] = usage.to_dict()
+        return result
+
+
+def summarize(results: List[Dict], wall_time: float) -> Dict:
+    """Resumen del batch: percentiles de latencia, errores, tokens y throughput"""
+    latencies = [r["latency_s"] for r in results if r["error"] is None]
+    summary = {
+        "questions": len(results),
+        "errors": sum(1 for r in results if r["error"] is not None),
+        "wall_time_s": round(wall_time, 3),
+        "throughput_qps": round(len(results) / wall_time, 3) if wall_time > 0 else None,
+        "total_tokens": sum(r["token_usage"]["total_tokens"] for r in results),
+        "avg_tool_calls": round(sum(r["tool_calls"] for r in results) / len(results), 2) if results else None,
+        "parse_errors": sum(r["parse_errors"] for r in results),
+    }
+    for pct in (50, 95, 99):
+        value = percentile(latencies, pct)
+        summary[f"p{pct}_latency_s"] = round(value, 3) if value is not None else None
+    return summary
+
+
+async def run_batch(
+    input_path: Path,
+    output_path: Path,
+    concurrency: int = 4,
+    field: str = "question",
+) -> Dict:
+    """
+    Responde todas las preguntas del JSONL con como máximo `concurrency` en vuelo.
+    Escribe cada resultado en `output_path` a medida que termina y el resumen en
+    `<output>.summary.json`.
+    """
+    questions = load_questions(input_path, field)
+    if not questions:
+        print("El archivo no contiene preguntas.")
+        return {}
+
+    print(f"Inicializando agente GraphRAG para {len(questions)} preguntas (concurrencia {concurrency})...")
+    agent_executor = create_graphiti_agent()
+    agent_executor.verbose = False
+    semaphore = asyncio.Semaphore(concurrency)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    results = []
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(answer_question(agent_executor, item, semaphore)) for item in questions]
+    with open(output_path, "w", encoding="utf-8") as out:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            results.append(result)
+            out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            status = "ERROR" if result["error"] else "OK"
+            print(f"[{len(results)}/{len(questions)}] {status} {result['id']} ({result['latency_s']}s)")
+    summary = summarize(results, time.perf_counter() - start)
+
+    summary_path = output_path.with_suffix(".summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print("=" * 60)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if summary["total_tokens"] == 0 and summary["questions"] > summary["errors"]:
+        print("⚠️ El chat model no reportó uso de tokens (¿falta stream_usage=True?).")
+    print(f"Respuestas en {output_path}, resumen en {summary_path}")
+    print("=" * 60)
+    return summary
+
+
+def main():
+    """Punto de entrada del modo batch"""
+    parser = argparse.ArgumentParser(description="Responde un set de preguntas con el agente GraphRAG.")
+    parser.add_argument("input", type=Path, help="JSONL con una pregunta por línea")
+    parser.add_argument("--output", type=Path, default=Path("data/output/batch_answers.jsonl"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--field", default="question", help="Campo del JSON con la pregunta")
+    parser.add_argument("--max-p95", type=float, default=None, help="Falla si el p95 (segundos) supera este valor")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_batch(args.input, args.output, args.concurrency, args.field))
+    if not summary:
+        sys.exit(1)
+    if summary["errors"]:
+        print(f"❌ {summary['errors']} preguntas fallaron.")
+        sys.exit(1)
+    if args.max_p95 is not None and (summary["p95_latency_s"] or 0) > args.max_p95:
+        print(f"❌ p95 {summary['p95_latency_s']}s supera el umbral de {args.max_p95}s.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,58 @@
 import asyncio
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 from src.agent.agent import create_graphiti_agent
+from src.agent.singleton_connection import get_connector
+from src.datapipeline.ingestion_worker import IngestionWorker
+from src.datapipeline.job_queue import IngestionQueue
 
 # Carga variables de entorno
 load_dotenv()
 
 
+async def _record_latency(ingestion_queue: IngestionQueue, latency: float):
+    """Registra la latencia fuera del event loop; un fallo no debe afectar al chatbot"""
+    try:
+        await asyncio.to_thread(ingestion_queue.record_interactive_latency, latency)
+    except Exception as e:
+        print(f"⚠️ No se pudo registrar la latencia: {e}")
+
+
+def _start_stdin_reader() -> asyncio.Queue:
+    """
+    Lee stdin en un thread daemon y entrega cada línea al event loop ('' en EOF). A
+    diferencia de asyncio.to_thread(input), el thread no retiene el cierre del proceso
+    cuando se cancela el loop con Ctrl-C.
+    """
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+
+    def read():
+        while True:
+            line = sys.stdin.readline()
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            except RuntimeError:
+                # El loop ya se cerró
+                return
+            if not line:
+                return
+
+    threading.Thread(target=read, name="stdin-reader", daemon=True).start()
+    return lines
+
+
+async def _read_question(stdin_lines: asyncio.Queue) -> str:
+    print("Tu pregunta: ", end="", flush=True)
+    line = await stdin_lines.get()
+    if not line:
+        raise EOFError
+    return line
+
+
 async def run_chatbot():
     """
     Ejecuta el chatbot con GraphRAG usando el agente ReAct.
@@ -15,6 +61,21 @@ async def run_chatbot():
     # Crea el agente
     print("Inicializando agente GraphRAG...\n")
     agent_executor = create_graphiti_agent()
+
+    # Cola de ingestión: se registra la latencia de cada respuesta para que los
+    # workers se frenen si el chatbot se degrada. Con BACKGROUND_INGESTION_WORKERS > 0
+    # la cola se drena en este mismo proceso, compartiendo la conexión del agente.
+    ingestion_queue = IngestionQueue()
+    ingestion_workers = int(os.getenv("BACKGROUND_INGESTION_WORKERS", "0"))
+    stop_ingestion = asyncio.Event()
+    ingestion_task = None
+    stdin_lines = None
+    if ingestion_workers > 0:
+        worker = IngestionWorker(ingestion_queue, get_connector().graphiti, concurrency=ingestion_workers)
+        ingestion_task = asyncio.create_task(worker.run(stop_event=stop_ingestion))
+        print(f"Ingestión en segundo plano activa ({ingestion_workers} workers).")
+        # Con workers activos stdin se lee sin bloquear el loop
+        stdin_lines = _start_stdin_reader()
     
     print("=" * 60)
     print("Chatbot GraphRAG con Graphiti + Neo4j")
@@ -22,10 +83,25 @@ async def run_chatbot():
     print("Escribe 'salir' para terminar\n")
     
     # Loop de conversación
+    try:
+        await _conversation_loop(agent_executor, ingestion_queue, stdin_lines)
+    except asyncio.CancelledError:
+        # En Python 3.11 Ctrl-C cancela la tarea principal en lugar de lanzar KeyboardInterrupt
+        print("\n\n¡Hasta luego!")
+    finally:
+        if ingestion_task is not None:
+            stop_ingestion.set()
+            await ingestion_task
+
+
+async def _conversation_loop(agent_executor, ingestion_queue: IngestionQueue, stdin_lines: asyncio.Queue = None):
     while True:
         try:
             # Obtiene pregunta del usuario
-            user_question = input("Tu pregunta: ").strip()
+            if stdin_lines is None:
+                user_question = input("Tu pregunta: ").strip()
+            else:
+                user_question = (await _read_question(stdin_lines)).strip()
             
             if not user_question:
                 continue
@@ -36,15 +112,24 @@ async def run_chatbot():
             
             # Invoca al agente (async)
             print("\n🤖 Pensando...\n")
-            response = await agent_executor.ainvoke({"input": user_question})
+            start = time.perf_counter()
+            try:
+                response = await agent_executor.ainvoke({"input": user_question})
+            except Exception:
+                # Los turnos fallidos también cuentan para el throttling de la ingestión
+                await _record_latency(ingestion_queue, time.perf_counter() - start)
+                raise
+            latency = time.perf_counter() - start
             
             # Muestra la respuesta
             print("\n" + "=" * 60)
             print("Respuesta:")
             print(response["output"])
             print("=" * 60 + "\n")
+
+            await _record_latency(ingestion_queue, latency)
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             print("\n\n¡Hasta luego!")
             break
         except Exception as e:
@@ -53,7 +138,11 @@ async def run_chatbot():
 
 def main():
     """Punto de entrada del chatbot"""
-    asyncio.run(run_chatbot())
+    try:
+        asyncio.run(run_chatbot())
+    except KeyboardInterrupt:
+        # asyncio.run relanza el Ctrl-C después de que run_chatbot cerró la ingestión
+        pass
 
 
 if __name__ == "__main__":
@@ -1,3 +1,6 @@
+import re
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Optional
 from langchain.tools import tool
@@ -12,6 +15,106 @@ def get_graphiti():
     return get_connector().graphiti
 
 
+def _escape_lucene(text: str) -> str:
+    """Escapa los caracteres especiales de Lucene para los índices fulltext"""
+    return re.sub(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)', r'\\\1', text)
+
+
+# Una sola lectura: comunidades que matchean el tema (fulltext sobre name/summary)
+# con sus miembros principales, más las entidades que matchean (fulltext de Graphiti
+# node_name_and_summary) con sus comunidades. Ambas ramas se ordenan por score.
+COMMUNITY_OVERVIEW_QUERY = """
+CALL {
+    CALL db.index.fulltext.queryNodes('community_name_and_summary', $query, {limit: $limit})
+    YIELD node AS c, score
+    OPTIONAL MATCH (c)-[:HAS_MEMBER]->(member:Entity)
+    WITH c, score, member
+    ORDER BY score DESC, size(coalesce(member.summary, '')) DESC
+    WITH c, score, collect(member.name)[..$members] AS members
+    RETURN 'community' AS kind, c.name AS name, c.summary AS summary, members, score
+    UNION ALL
+    CALL db.index.fulltext.queryNodes('node_name_and_summary', $query, {limit: $limit})
+    YIELD node AS e, score
+    OPTIONAL MATCH (c:Community)-[:HAS_MEMBER]->(e)
+    WITH e, score, collect(c.name) AS communities
+    RETURN 'entity' AS kind, e.name AS name, e.summary AS summary, communities AS members, score
+}
+RETURN kind, name, summary, members, score
+ORDER BY kind, score DESC
+"""
+
+# Expansión k-hop desde las entidades semilla en una sola consulta. Solo se recorren
+# relaciones vigentes en $reference_time; los saltos más cercanos van primero.
+# La expansión avanza por frontera: cada salto parte solo de los nodos nuevos del salto
+# anterior y trae a lo sumo $limit relaciones, así un nodo hub no enumera caminos.
+_NEIGHBORHOOD_START = """
+MATCH (seed:Entity) WHERE seed.uuid IN $seed_uuids
+WITH collect(DISTINCT seed) AS frontier
+WITH frontier, frontier AS visited, [] AS rels
+"""
+
+_NEIGHBORHOOD_HOP = """
+CALL {
+    WITH frontier
+    UNWIND frontier AS n
+    MATCH (n)-[r:RELATES_TO]-(m:Entity)
+    WHERE (r.valid_at IS NULL OR r.valid_at <= $reference_time)
+      AND (r.invalid_at IS NULL OR r.invalid_at > $reference_time)
+    WITH r, m LIMIT $limit
+    RETURN collect(DISTINCT r) AS hop_rels, collect(DISTINCT m) AS hop_nodes
+}
+WITH [m IN hop_nodes WHERE NOT m IN visited] AS frontier,
+     visited + [m IN hop_nodes WHERE NOT m IN visited] AS visited,
+     rels + [r IN hop_rels WHERE NOT r IN rels] AS rels
+"""
+
+_NEIGHBORHOOD_END = """
+UNWIND rels AS r
+RETURN startNode(r).name AS source, r.name AS relation, endNode(r).name AS target,
+       r.fact AS fact, r.valid_at AS valid_at, r.invalid_at AS invalid_at
+LIMIT $limit
+"""
+
+
+def neighborhood_query(hops: int) -> str:
+    """Consulta de expansión k-hop en una sola ida al grafo (relaciones más cercanas primero)"""
+    return _NEIGHBORHOOD_START + _NEIGHBORHOOD_HOP * hops + _NEIGHBORHOOD_END
+
+
+MAX_HOPS = 3
+MAX_SEEDS = 10
+MAX_SUBGRAPH_EDGES = 100
+
+
+class _NeighborhoodCache:
+    """Caché LRU de vecindarios expandidos, con TTL para reflejar nuevas ingestas"""
+
+    def __init__(self, maxsize: int = 128, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+_neighborhood_cache = _NeighborhoodCache()
+
+
 @tool
 async def hybrid_search(query: str, limit: int = 10) -> str:
     """
@@ -126,6 +229,132 @@ async def temporal_aware_search(
     return "\n".join(output)
 
 
+@tool
+async def community_overview(topic: str, limit: int = 5) -> str:
+    """
+    Vista general precomputada: devuelve los resúmenes de comunidades (clusters de
+    entidades relacionadas) y los resúmenes acumulados de las entidades que coinciden
+    con el tema, en una sola lectura del grafo.
+
+    Útil para: preguntas amplias o de panorama ("dame un resumen de TechNova",
+    "¿qué áreas de negocio tiene la empresa?"). Evita encadenar varias búsquedas.
+
+    Args:
+        topic: Tema o entidad (ej: "TechNova", "productos", "alianzas en Asia")
+        limit: Número máximo de comunidades y de entidades (default: 5)
+
+    Returns:
+        Resúmenes de comunidades y entidades relacionadas con el tema
+    """
+    graphiti = get_graphiti()
+    records, _, _ = await graphiti.driver.execute_query(
+        COMMUNITY_OVERVIEW_QUERY,
+        query=_escape_lucene(topic),
+        limit=limit,
+        members=10
+    )
+
+    if not records:
+        return (f"No hay resúmenes precomputados para '{topic}'. "
+                "Usá `hybrid_search` o ejecutá src.datapipeline.build_communities.")
+
+    output = [f"=== VISTA GENERAL: {topic} ==="]
+    for record in records:
+        members = ", ".join(m for m in record["members"] if m)
+        if record["kind"] == "community":
+            output.append(f"[COMUNIDAD] {record['name']}: {record['summary'] or 'Sin resumen'}")
+            if members:
+                output.append(f"  Miembros: {members}")
+        else:
+            output.append(f"[ENTIDAD] {record['name']}: {record['summary'] or 'Sin descripción'}")
+            if members:
+                output.append(f"  Comunidades: {members}")
+
+    return "\n".join(output)
+
+
+@tool
+async def graph_expansion(
+    query: str,
+    hops: int = 2,
+    reference_time: Optional[str] = None,
+    seeds: int = 3,
+    limit: int = 30
+) -> str:
+    """
+    Expansión multi-hop: busca las entidades semilla de la consulta y trae su vecindario
+    de hasta `hops` saltos en una sola consulta al grafo, filtrando las relaciones
+    vigentes en `reference_time`. Devuelve un subgrafo compacto (origen -relación-> destino).
+
+    Útil para: cadenas de relaciones ("¿quién reporta a la persona que fundó el producto X?",
+    "¿con qué empresas se asoció el fundador de TechNova?"). Reemplaza varias búsquedas
+    encadenadas.
+
+    Args:
+        query: Consulta para encontrar las entidades semilla (ej: "fundador de TechNova")
+        hops: Cantidad de saltos desde las semillas, entre 1 y 3 (default: 2)
+        reference_time: Fecha/hora ISO para el filtro temporal. Si es None, usa tiempo actual
+        seeds: Cantidad de entidades semilla, entre 1 y 10 (default: 3)
+        limit: Número máximo de relaciones en el subgrafo, entre 1 y 100 (default: 30)
+
+    Returns:
+        Subgrafo con las relaciones del vecindario de las semillas
+    """
+    graphiti = get_graphiti()
+
+    if reference_time:
+        try:
+            ref_time = datetime.fromisoformat(reference_time.replace('Z', '+00:00'))
+        except ValueError:
+            return "Error: timestamp inválido. Use formato ISO: YYYY-MM-DDTHH:MM:SSZ"
+        if ref_time.tzinfo is None:
+            ref_time = ref_time.replace(tzinfo=timezone.utc)
+    else:
+        # Se redondea al minuto para que consultas cercanas compartan la caché
+        ref_time = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    hops = max(1, min(int(hops), MAX_HOPS))
+    seeds = max(1, min(int(seeds), MAX_SEEDS))
+    limit = max(1, min(int(limit), MAX_SUBGRAPH_EDGES))
+
+    # Semillas: extremos de los hechos más relevantes para la consulta
+    results = await graphiti.search(query=query, num_results=seeds * 2)
+    seed_uuids = []
+    for item in results:
+        for node_uuid in (getattr(item, 'source_node_uuid', None), getattr(item, 'target_node_uuid', None)):
+            if node_uuid and node_uuid not in seed_uuids:
+                seed_uuids.append(node_uuid)
+    seed_uuids = seed_uuids[:seeds]
+
+    if not seed_uuids:
+        return f"No se encontraron entidades semilla para '{query}'."
+
+    # La clave usa el mismo instante que el filtro temporal; en caché solo se guardan
+    # las relaciones, el encabezado con la consulta se arma en cada llamada
+    cache_key = (tuple(sorted(seed_uuids)), hops, ref_time.isoformat(), limit)
+    lines = _neighborhood_cache.get(cache_key)
+    if lines is None:
+        records, _, _ = await graphiti.driver.execute_query(
+            neighborhood_query(hops),
+            seed_uuids=seed_uuids,
+            reference_time=ref_time,
+            limit=limit
+        )
+        lines = []
+        for record in records:
+            period = ""
+            if record["valid_at"] or record["invalid_at"]:
+                period = f" [{record['valid_at'] or '?'} → {record['invalid_at'] or 'vigente'}]"
+            lines.append(
+                f"{record['source']} -[{record['relation']}]-> {record['target']}: {record['fact']}{period}"
+            )
+        _neighborhood_cache.put(cache_key, lines)
+
+    if not lines:
+        return f"No se encontraron relaciones a {hops} saltos de '{query}' en {ref_time.strftime('%Y-%m-%d')}."
+    header = f"=== SUBGRAFO ({hops} saltos, {ref_time.strftime('%Y-%m-%d')}): {query} ==="
+    return "\n".join([header] + lines)
+
+
 if __name__ == "__main__":
     import asyncio
 
@@ -140,4 +369,12 @@ if __name__ == "__main__":
         )
         print(res2, "\n")
 
+        print("🔎 Probando community_overview...")
+        res3 = await community_overview.ainvoke({"topic": "TechNova", "limit": 5})
+        print(res3, "\n")
+
+        print("🔎 Probando graph_expansion...")
+        res4 = await graph_expansion.ainvoke({"query": "fundador de TechNova", "hops": 2})
+        print(res4, "\n")
+
     asyncio.run(test_tools())
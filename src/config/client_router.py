@@ -0,0 +1,369 @@
+"""
+Módulo para repartir las llamadas de LLM, embeddings y chat entre varios deployments
+
+El pool se define en un archivo JSON (ruta en la variable CLIENT_POOL_CONFIG) con una
+sección por tipo de cliente. Ejemplo:
+
+{
+    "strategy": "least_loaded",
+    "llm": [
+        {"provider": "azure", "endpoint": "https://eastus.openai.azure.com/",
+         "api_key": "env:AZURE_OPENAI_API_KEY", "api_version": "2024-10-21",
+         "deployment": "gpt-4o-mini", "weight": 2},
+        {"provider": "azure", "endpoint": "https://westeurope.openai.azure.com/",
+         "api_key": "env:AZURE_OPENAI_API_KEY_WEU", "deployment": "gpt-4o-mini"}
+    ],
+    "embedding": [
+        {"provider": "azure", "endpoint": "...", "deployment": "emb-eastus", "model": "text-embedding-3-small"},
+        {"provider": "azure", "endpoint": "...", "deployment": "emb-weu", "model": "text-embedding-3-small"}
+    ],
+    "chat": [
+        {"provider": "azure", "endpoint": "...", "deployment": "gpt-4o-mini"},
+        {"provider": "openai", "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/",
+         "api_key": "env:GOOGLE_API_KEY", "deployment": "gemini-2.0-flash"}
+    ]
+}
+
+Los valores con prefijo "env:" se leen de variables de entorno para no guardar
+credenciales en el archivo. El proveedor "openai" acepta cualquier endpoint compatible
+con la API de OpenAI (incluido Gemini), pero solo en la sección "chat": Graphiti usa
+`responses.parse` y `logprobs`/`logit_bias` en el reranker, que esos endpoints no
+implementan, por lo que la sección "llm" admite solo miembros Azure. Todos los miembros
+de "embedding" deben declarar el mismo `model`: mezclar modelos de embeddings rompe el
+espacio vectorial.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from openai import (
+    AsyncAzureOpenAI,
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    AuthenticationError,
+    InternalServerError,
+    NotFoundError,
+    PermissionDeniedError,
+    RateLimitError,
+)
+
+# Errores transitorios: se marca el deployment como degradado y se reintenta en otro
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# Deployment mal configurado (credenciales, nombre o permisos): se saca del pool por el
+# cooldown máximo y se reintenta en otro
+MISCONFIGURED_ERRORS = (AuthenticationError, NotFoundError, PermissionDeniedError)
+
+# Secciones cuyos miembros deben ser Azure (Graphiti usa APIs que otros proveedores no tienen)
+AZURE_ONLY_SECTIONS = ("llm",)
+
+STRATEGIES = ("least_loaded", "weighted")
+
+
+def _resolve(value):
+    """Reemplaza los valores "env:NOMBRE" por el contenido de la variable de entorno"""
+    if isinstance(value, str) and value.startswith("env:"):
+        return os.getenv(value[4:])
+    return value
+
+
+class Deployment:
+    """Un endpoint/deployment del pool junto con su estado de salud y carga"""
+
+    def __init__(self, config: dict, default_api_version: Optional[str] = None):
+        self.provider = config.get("provider", "azure")
+        self.endpoint = _resolve(config.get("endpoint"))
+        self.base_url = _resolve(config.get("base_url"))
+        self.api_key = _resolve(config.get("api_key"))
+        self.api_version = _resolve(config.get("api_version")) or default_api_version
+        self.deployment = _resolve(config["deployment"])
+        # Modelo subyacente; en Azure el nombre del deployment puede no coincidir
+        self.model = _resolve(config.get("model")) or self.deployment
+        self.weight = float(config.get("weight", 1))
+        self.name = config.get("name") or f"{self.provider}:{self.endpoint or self.base_url}/{self.deployment}"
+
+        # Estado de salud
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.latency_ema = 0.0
+        self.total_calls = 0
+        self.total_failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def load(self) -> float:
+        """Carga relativa al peso; a igual carga se prefiere el de menor latencia"""
+        return (self.in_flight + 1) / self.weight
+
+    def create_async_client(self):
+        """
+        Crea el cliente asíncrono con la interfaz de OpenAI para este deployment. Sin
+        reintentos del SDK: los reintentos y el failover los maneja el router.
+        """
+        if self.provider == "azure":
+            return AsyncAzureOpenAI(
+                api_key=self.api_key,
+                api_version=self.api_version,
+                azure_endpoint=self.endpoint,
+                max_retries=0
+            )
+        if self.provider == "openai":
+            return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        raise ValueError(f"Proveedor no soportado: {self.provider}")
+
+    def create_chat_model(self):
+        """Crea el chat model de LangChain para este deployment"""
+        if self.provider == "azure":
+            from langchain_openai import AzureChatOpenAI
+            return AzureChatOpenAI(
+                azure_endpoint=self.endpoint,
+                api_key=self.api_key,
+                deployment_name=self.deployment,
+                api_version=self.api_version,
+                max_retries=0,
+                stream_usage=True
+            )
+        if self.provider == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(api_key=self.api_key, base_url=self.base_url, model=self.deployment,
+                              max_retries=0, stream_usage=True)
+        raise ValueError(f"Proveedor no soportado: {self.provider}")
+
+
+class ClientRouter:
+    """
+    Selecciona un deployment por llamada (menor carga o ponderado), registra la salud
+    de cada uno y hace failover automático ante errores transitorios.
+    """
+
+    def __init__(
+        self,
+        deployments: List[Deployment],
+        strategy: str = "least_loaded",
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 300.0,
+    ):
+        if not deployments:
+            raise ValueError("El pool de deployments está vacío.")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia inválida: {strategy}. Opciones: {STRATEGIES}")
+        self.deployments = deployments
+        self.strategy = strategy
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+
+    def _candidates(self, exclude: set) -> List[Deployment]:
+        now = time.monotonic()
+        remaining = [d for d in self.deployments if d.name not in exclude]
+        healthy = [d for d in remaining if d.is_healthy(now)]
+        if healthy:
+            return healthy
+        # Todos en cooldown: se usa el que se recupera antes
+        return sorted(remaining, key=lambda d: d.cooldown_until)[:1]
+
+    def select(self, exclude: Optional[set] = None) -> Optional[Deployment]:
+        """Elige el próximo deployment excluyendo los que ya fallaron en esta llamada"""
+        candidates = self._candidates(exclude or set())
+        if not candidates:
+            return None
+        if self.strategy == "weighted":
+            return random.choices(candidates, weights=[d.weight for d in candidates])[0]
+        return min(candidates, key=lambda d: (d.load(), d.latency_ema))
+
+    def record_success(self, deployment: Deployment, elapsed: float):
+        deployment.total_calls += 1
+        deployment.consecutive_failures = 0
+        deployment.cooldown_until = 0.0
+        deployment.latency_ema = elapsed if deployment.latency_ema == 0 else 0.8 * deployment.latency_ema + 0.2 * elapsed
+
+    def record_failure(self, deployment: Deployment, error: Exception):
+        deployment.total_calls += 1
+        deployment.total_failures += 1
+        deployment.consecutive_failures += 1
+        if isinstance(error, MISCONFIGURED_ERRORS):
+            # No se recupera solo: queda fuera del pool el máximo tiempo posible
+            cooldown = self.max_cooldown_seconds
+        else:
+            # Backoff exponencial por deployment; respeta Retry-After si el proveedor lo envía
+            cooldown = min(
+                self.cooldown_seconds * 2 ** (deployment.consecutive_failures - 1),
+                self.max_cooldown_seconds
+            )
+            retry_after = _retry_after(error)
+            if retry_after is not None:
+                cooldown = max(cooldown, retry_after)
+        deployment.cooldown_until = time.monotonic() + cooldown
+        print(f"Deployment '{deployment.name}' degradado por {cooldown:.0f}s: {error}")
+
+    async def call(self, invoke):
+        """
+        Ejecuta `invoke(deployment)` (corrutina) sobre el deployment elegido. Ante un error
+        transitorio o de configuración (credenciales, deployment inexistente, permisos)
+        marca el deployment y reintenta con el siguiente del pool.
+        """
+        tried = set()
+        last_error = None
+        while True:
+            deployment = self.select(exclude=tried)
+            if deployment is None:
+                raise last_error
+            tried.add(deployment.name)
+            deployment.in_flight += 1
+            start = time.monotonic()
+            try:
+                result = await invoke(deployment)
+            except RETRYABLE_ERRORS + MISCONFIGURED_ERRORS as e:
+                self.record_failure(deployment, e)
+                last_error = e
+                continue
+            finally:
+                deployment.in_flight -= 1
+            self.record_success(deployment, time.monotonic() - start)
+            return result
+
+    def stats(self) -> List[Dict]:
+        """Estado actual del pool (para logging o diagnóstico)"""
+        now = time.monotonic()
+        return [
+            {
+                "name": d.name,
+                "healthy": d.is_healthy(now),
+                "in_flight": d.in_flight,
+                "calls": d.total_calls,
+                "failures": d.total_failures,
+                "latency_ema": round(d.latency_ema, 3),
+            }
+            for d in self.deployments
+        ]
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _RoutedMethod:
+    """
+    Acumula la ruta de atributos (ej: chat.completions.create) y al llamarla la ejecuta
+    sobre el cliente del deployment elegido, sustituyendo `model` por su deployment.
+    """
+
+    def __init__(self, routed_client: "RoutedAsyncClient", path: tuple):
+        self._routed_client = routed_client
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _RoutedMethod(self._routed_client, self._path + (name,))
+
+    async def __call__(self, *args, **kwargs):
+        async def invoke(deployment: Deployment):
+            target = self._routed_client.client_for(deployment)
+            for attr in self._path:
+                target = getattr(target, attr)
+            if "model" in kwargs:
+                kwargs["model"] = deployment.deployment
+            return await target(*args, **kwargs)
+
+        return await self._routed_client.router.call(invoke)
+
+
+class RoutedAsyncClient:
+    """
+    Reemplazo de AsyncAzureOpenAI para Graphiti (OpenAIClient, OpenAIEmbedder y
+    OpenAIRerankerClient): cada llamada se enruta a un deployment del pool.
+    """
+
+    def __init__(self, router: ClientRouter):
+        self.router = router
+        self._clients = {}
+
+    def client_for(self, deployment: Deployment):
+        if deployment.name not in self._clients:
+            self._clients[deployment.name] = deployment.create_async_client()
+        return self._clients[deployment.name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _RoutedMethod(self, (name,))
+
+
+class RoutedChatModel:
+    """
+    Chat model de LangChain enrutado. Igual que SafeLLM, expone `bind` para que
+    create_react_agent pueda agregar `stop`; cada invocación elige un deployment.
+    """
+
+    def __init__(self, router: ClientRouter):
+        self.router = router
+        self._models = {d.name: d.create_chat_model() for d in router.deployments}
+
+    def bind(self, **kwargs):
+        from langchain_core.runnables import RunnableLambda
+
+        async def ainvoke(input, config=None):
+            async def invoke(deployment: Deployment):
+                return await self._models[deployment.name].bind(**kwargs).ainvoke(input, config=config)
+            return await self.router.call(invoke)
+
+        def invoke_sync(input, config=None):
+            return asyncio.run(ainvoke(input, config=config))
+
+        return RunnableLambda(invoke_sync, afunc=ainvoke, name="RoutedChatModel")
+
+    def __getattr__(self, name):
+        """Delegamos el resto de atributos al primer deployment del pool"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._models[self.router.deployments[0].name], name)
+
+
+def load_pool_config(path: Optional[str] = None) -> Optional[dict]:
+    """Lee el archivo de configuración del pool (CLIENT_POOL_CONFIG). None si no está definido."""
+    path = path or os.getenv("CLIENT_POOL_CONFIG")
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_router(pool_config: dict, section: str, default_api_version: Optional[str] = None) -> Optional[ClientRouter]:
+    """Construye el router para una sección del pool ("llm", "embedding" o "chat")"""
+    members = pool_config.get(section)
+    if not members:
+        return None
+    deployments = [Deployment(m, default_api_version) for m in members]
+
+    if section in AZURE_ONLY_SECTIONS:
+        invalid = [d.name for d in deployments if d.provider != "azure"]
+        if invalid:
+            raise ValueError(
+                f"La sección '{section}' solo admite deployments Azure (Graphiti usa responses.parse "
+                f"y logprobs, no soportados por otros proveedores): {invalid}. Usalos en 'chat'."
+            )
+    if section == "embedding":
+        models = {d.model for d in deployments}
+        if len(models) > 1:
+            raise ValueError(
+                f"Los deployments de 'embedding' usan modelos distintos {sorted(models)}; "
+                "mezclarlos rompe el espacio vectorial."
+            )
+    return ClientRouter(
+        deployments,
+        strategy=pool_config.get("strategy", "least_loaded"),
+        cooldown_seconds=float(pool_config.get("cooldown_seconds", 30)),
+        max_cooldown_seconds=float(pool_config.get("max_cooldown_seconds", 300)),
+    )
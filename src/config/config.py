@@ -6,6 +6,7 @@ import os
 from dotenv import load_dotenv
 from graphiti_core import Graphiti
 from neo4j import GraphDatabase
+from src.config.neo4j_indexes import setup_indexes
 from graphiti_core.llm_client.gemini_client import GeminiClient, LLMConfig
 from graphiti_core.embedder.gemini import GeminiEmbedder, GeminiEmbedderConfig
 from graphiti_core.cross_encoder.gemini_reranker_client import GeminiRerankerClient
@@ -65,33 +66,8 @@ class GraphitiConnector:
         """Crea los índices fulltext y regulares necesarios para Graphiti en Neo4j Aura"""
         try:
             with self.neo4j_driver.session(database=self.neo4j_database) as session:
-                # Índice fulltext para nodos (name y summary)
-                session.run("""
-                    CREATE FULLTEXT INDEX node_name_and_summary IF NOT EXISTS
-                    FOR (n:Node) ON EACH [n.name, n.summary]
-                """)
-                print("Índice fulltext 'node_name_and_summary' creado o ya existe.")
-
-                # Índice fulltext para entidades (name y description)
-                session.run("""
-                    CREATE FULLTEXT INDEX entity_search IF NOT EXISTS
-                    FOR (n:Entity) ON EACH [n.name, n.description]
-                """)
-                print("Índice fulltext 'entity_search' creado o ya existe.")
-
-                # Índice regular para UUIDs
-                session.run("""
-                    CREATE INDEX node_uuid IF NOT EXISTS
-                    FOR (n:Node) ON (n.uuid)
-                """)
-                print("Índice regular 'node_uuid' creado o ya existe.")
-                session.run("""
-                    CREATE FULLTEXT INDEX edge_name_and_fact IF NOT EXISTS
-                    FOR ()-[r]-()
-                    ON EACH [r.name, r.fact]
-                """)
-                print("Índice fulltext 'edge_name_and_fact' creado o ya existe.")
-                print("Todos los índices necesarios están configurados.")
+                # Definiciones compartidas, alineadas con las queries de Graphiti
+                setup_indexes(session)
         except Exception as e:
             raise Exception(f"Error creando índices en Neo4j: {e}")
 
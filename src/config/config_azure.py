@@ -8,11 +8,18 @@ import os
 from dotenv import load_dotenv
 from graphiti_core import Graphiti
 from neo4j import GraphDatabase
+from src.config.neo4j_indexes import setup_indexes
 from graphiti_core.llm_client import LLMConfig, OpenAIClient
 from graphiti_core.embedder.openai import OpenAIEmbedder, OpenAIEmbedderConfig
 from graphiti_core.cross_encoder.openai_reranker_client import OpenAIRerankerClient
 from openai import AzureOpenAI
 from langchain_openai import AzureChatOpenAI
+from src.config.client_router import (
+    RoutedAsyncClient,
+    RoutedChatModel,
+    build_router,
+    load_pool_config,
+)
 
 load_dotenv(override=True)
 
@@ -41,6 +48,10 @@ class GraphitiConnector:
         self.neo4j_password = os.getenv("NEO4J_PASSWORD")
         self.neo4j_database = os.getenv("NEO4J_DATABASE")
 
+        # Pool opcional de deployments (CLIENT_POOL_CONFIG); sin él se usa un único deployment
+        self.pool_config = load_pool_config()
+        self.routers = {}
+
         # Instancias
         self.azure_client,self.azure_embedding_client,self.azure_graphity_client,self.azure_chat = self._setup_azure_openai()
         self.neo4j_driver = self._setup_neo4j()
@@ -51,36 +62,8 @@ class GraphitiConnector:
         """Crea los índices fulltext y regulares necesarios para Graphiti en Neo4j Aura"""
         try:
             with self.neo4j_driver.session(database=self.neo4j_database) as session:
-                # Tus índices existentes...
-                # Índice fulltext para nodos (name y summary)
-                session.run("""
-                    CREATE FULLTEXT INDEX node_name_and_summary IF NOT EXISTS
-                    FOR (n:Node) ON EACH [n.name, n.summary]
-                """)
-                print("Índice fulltext 'node_name_and_summary' creado o ya existe.")
-
-                # Índice fulltext para entidades (name y description)
-                session.run("""
-                    CREATE FULLTEXT INDEX entity_search IF NOT EXISTS
-                    FOR (n:Entity) ON EACH [n.name, n.description]
-                """)
-                print("Índice fulltext 'entity_search' creado o ya existe.")
-
-                # Índice regular para UUIDs
-                session.run("""
-                    CREATE INDEX node_uuid IF NOT EXISTS
-                    FOR (n:Node) ON (n.uuid)
-                """)
-                print("Índice regular 'node_uuid' creado o ya existe.")
-
-                # Nuevo índice fulltext para edges (name y fact)
-                session.run("""
-                    CREATE FULLTEXT INDEX edge_name_and_fact IF NOT EXISTS
-                    FOR ()-[r:RELATES_TO]-() ON EACH [r.name, r.fact]
-                """)
-                print("Índice fulltext 'edge_name_and_fact' creado o ya existe.")
-
-                print("Todos los índices necesarios están configurados.")
+                # Definiciones compartidas, alineadas con las queries de Graphiti
+                setup_indexes(session)
         except Exception as e:
             raise Exception(f"Error creando índices en Neo4j: {e}")
 
@@ -106,12 +89,45 @@ class GraphitiConnector:
                 azure_endpoint=self.azure_endpoint,
                 api_key=self.azure_api_key,
                 deployment_name=self.azure_chat_deployment_name,
-                api_version=self.azure_chat_api_version
+                api_version=self.azure_chat_api_version,
+                # AgentExecutor hace streaming del LLM: sin esto no se reporta el uso de tokens
+                stream_usage=True
             )
+            if self.pool_config:
+                azure_graphiti_client, embedding_client_azure, azure_chat_client = self._setup_routed_clients(
+                    azure_graphiti_client, embedding_client_azure, azure_chat_client
+                )
             return azure_client,embedding_client_azure,azure_graphiti_client,azure_chat_client
         except Exception as e:
             raise
 
+    def _setup_routed_clients(self, graphiti_client, embedding_client, chat_client):
+        """
+        Reemplaza los clientes por routers sobre el pool de deployments. Las secciones
+        que no estén en el pool mantienen el cliente de un único deployment.
+        """
+        llm_router = build_router(self.pool_config, "llm", self.azure_api_version)
+        embedding_router = build_router(self.pool_config, "embedding", self.embedding_api_version)
+        chat_router = build_router(self.pool_config, "chat", self.azure_chat_api_version)
+
+        if llm_router:
+            self.routers["llm"] = llm_router
+            graphiti_client = RoutedAsyncClient(llm_router)
+        if embedding_router:
+            self.routers["embedding"] = embedding_router
+            embedding_client = RoutedAsyncClient(embedding_router)
+        if chat_router:
+            self.routers["chat"] = chat_router
+            chat_client = RoutedChatModel(chat_router)
+
+        for section, router in self.routers.items():
+            print(f"Pool '{section}': {len(router.deployments)} deployments ({router.strategy}).")
+        return graphiti_client, embedding_client, chat_client
+
+    def get_router_stats(self) -> dict:
+        """Devuelve el estado de salud y carga de cada pool configurado"""
+        return {section: router.stats() for section, router in self.routers.items()}
+
     def _setup_neo4j(self) -> GraphDatabase.driver:
         """Configura la conexión con Neo4j"""
         try:
@@ -0,0 +1,88 @@
+"""
+Definición única de los índices de Neo4j que usa el proyecto
+
+Los fulltext replican los nombres, labels y propiedades que consultan las búsquedas de
+Graphiti (db.index.fulltext.queryNodes/queryRelationships), más el de comunidades que
+usa la herramienta `community_overview`. Los range cubren los lookups por uuid, group_id
+y validez temporal de ingestión y búsqueda. Los comparte la configuración de Azure, la
+de Gemini y el profiler de queries (query_profiler.py).
+
+Como los CREATE usan IF NOT EXISTS, un índice con el mismo nombre pero otra definición
+(ej: el node_name_and_summary sobre :Node que creaba la configuración original) no se
+reemplazaría solo: setup_indexes lo compara con SHOW INDEXES y lo recrea.
+"""
+from typing import Dict, List
+
+FULLTEXT = "FULLTEXT"
+RANGE = "RANGE"
+
+INDEX_DEFINITIONS: List[Dict] = [
+    # Fulltext consultados por Graphiti
+    {"name": "node_name_and_summary", "type": FULLTEXT, "relationship": False,
+     "label": "Entity", "properties": ["name", "summary", "group_id"]},
+    {"name": "edge_name_and_fact", "type": FULLTEXT, "relationship": True,
+     "label": "RELATES_TO", "properties": ["name", "fact", "group_id"]},
+    {"name": "community_name", "type": FULLTEXT, "relationship": False,
+     "label": "Community", "properties": ["name", "group_id"]},
+    {"name": "episode_content", "type": FULLTEXT, "relationship": False,
+     "label": "Episodic", "properties": ["content", "source", "source_description", "group_id"]},
+    # Fulltext de resúmenes precomputados (community_overview)
+    {"name": "community_name_and_summary", "type": FULLTEXT, "relationship": False,
+     "label": "Community", "properties": ["name", "summary"]},
+    # Range para lookups de Graphiti
+    {"name": "entity_uuid", "type": RANGE, "relationship": False, "label": "Entity", "properties": ["uuid"]},
+    {"name": "episode_uuid", "type": RANGE, "relationship": False, "label": "Episodic", "properties": ["uuid"]},
+    {"name": "community_uuid", "type": RANGE, "relationship": False, "label": "Community", "properties": ["uuid"]},
+    {"name": "relation_uuid", "type": RANGE, "relationship": True, "label": "RELATES_TO", "properties": ["uuid"]},
+    {"name": "mention_uuid", "type": RANGE, "relationship": True, "label": "MENTIONS", "properties": ["uuid"]},
+    {"name": "has_member_uuid", "type": RANGE, "relationship": True, "label": "HAS_MEMBER", "properties": ["uuid"]},
+    {"name": "entity_group_id", "type": RANGE, "relationship": False, "label": "Entity", "properties": ["group_id"]},
+    {"name": "episode_group_id", "type": RANGE, "relationship": False, "label": "Episodic", "properties": ["group_id"]},
+    {"name": "relation_group_id", "type": RANGE, "relationship": True, "label": "RELATES_TO", "properties": ["group_id"]},
+    {"name": "valid_at_edge_index", "type": RANGE, "relationship": True, "label": "RELATES_TO", "properties": ["valid_at"]},
+    {"name": "invalid_at_edge_index", "type": RANGE, "relationship": True, "label": "RELATES_TO", "properties": ["invalid_at"]},
+]
+
+
+def create_statement(definition: Dict) -> str:
+    """Genera el CREATE ... IF NOT EXISTS de una definición de índice"""
+    var = "e" if definition["relationship"] else "n"
+    pattern = f"()-[{var}:{definition['label']}]-()" if definition["relationship"] else f"({var}:{definition['label']})"
+    properties = ", ".join(f"{var}.{prop}" for prop in definition["properties"])
+    if definition["type"] == FULLTEXT:
+        return f"CREATE FULLTEXT INDEX {definition['name']} IF NOT EXISTS FOR {pattern} ON EACH [{properties}]"
+    return f"CREATE INDEX {definition['name']} IF NOT EXISTS FOR {pattern} ON ({properties})"
+
+
+def load_existing_indexes(session) -> List[Dict]:
+    """Índices actuales de la base según SHOW INDEXES"""
+    records = session.run(
+        "SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties, state"
+    )
+    return [dict(record) for record in records]
+
+
+def matches_definition(index: Dict, definition: Dict) -> bool:
+    """True si el índice existente es del tipo de la definición y cubre su label y propiedades"""
+    return (
+        index["type"] == definition["type"]
+        and index["labelsOrTypes"] == [definition["label"]]
+        and set(definition["properties"]) <= set(index["properties"] or [])
+    )
+
+
+def setup_indexes(session):
+    """Crea todos los índices definidos en la sesión (sync) de Neo4j, recreando los que difieren"""
+    existing = {index["name"]: index for index in load_existing_indexes(session)}
+    for definition in INDEX_DEFINITIONS:
+        index = existing.get(definition["name"])
+        if index is not None and not matches_definition(index, definition):
+            print(
+                f"⚠️ El índice '{definition['name']}' es {index['type']} sobre {index['labelsOrTypes']} "
+                f"{index['properties']}, se esperaba {definition['type']} sobre {definition['label']} "
+                f"{definition['properties']}: se recrea."
+            )
+            session.run(f"DROP INDEX {definition['name']} IF EXISTS")
+        session.run(create_statement(definition))
+        print(f"Índice {definition['type'].lower()} '{definition['name']}' creado o ya existe.")
+    print("Todos los índices necesarios están configurados.")
@@ -0,0 +1,439 @@
+"""
+Profiler de queries Cypher y asesor de índices para el esquema de Neo4j
+
+1. Captura: QueryRecorder envuelve el driver de Graphiti y registra cada Cypher emitido
+   (execute_query y transacciones de sesión) agrupado por forma de query.
+2. Profiling: cada forma se ejecuta con PROFILE usando parámetros reales dentro de una
+   transacción que se revierte, así el PROFILE de las escrituras no modifica el grafo.
+3. Asesor: por forma reporta db hits, filas, operadores e índices usados, y recomienda
+   índices range, fulltext o vector faltantes comparando con SHOW INDEXES.
+4. Regresiones: con un reporte base (--baseline) marca las formas que pierden un índice
+   o aumentan sus db hits por encima de la tolerancia.
+
+Uso:
+    python -m src.config.query_profiler --search "CEO de TechNova" --search "productos" \
+        --output data/output/query_profile.json --baseline data/query_profile_baseline.json
+    python -m src.config.query_profiler --ingest data/output_episodes/episode_1.txt
+
+Con --ingest los episodios se agregan de verdad (para capturar las queries de
+ingestión), pero bajo un group_id propio del profiling: Graphiti deduplica solo dentro
+del grupo, así que no toca entidades ni hechos existentes, y el grupo se borra con
+clear_data al terminar el reporte.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config.neo4j_indexes import (
+    INDEX_DEFINITIONS, RANGE, create_statement, load_existing_indexes, matches_definition
+)
+
+# Operadores que indican que no se usó un índice para ubicar los nodos/relaciones
+SCAN_OPERATORS = {
+    "AllNodesScan",
+    "NodeByLabelScan",
+    "DirectedRelationshipTypeScan",
+    "UndirectedRelationshipTypeScan",
+    "DirectedAllRelationshipsScan",
+    "UndirectedAllRelationshipsScan",
+}
+
+# Tolerancia de aumento de db hits antes de considerar una regresión
+DB_HITS_REGRESSION_RATIO = 1.2
+
+_NODE_PATTERN = re.compile(r"\((\w+):(\w+)(?:\s*\{([^}]*)\})?")
+_REL_PATTERN = re.compile(r"\[(\w+):(\w+)(?:\s*\{([^}]*)\})?")
+_WHERE_PREDICATE = re.compile(r"\b(\w+)\.(\w+)\s*(?:=|IN|<=|>=|<|>|STARTS WITH)\s*\$")
+_FULLTEXT_CALL = re.compile(r"db\.index\.fulltext\.query(Nodes|Relationships)\(\s*[\"'$]?(\w+)")
+_VECTOR_SIMILARITY = re.compile(r"vector\.similarity\.\w+\(\s*(\w+)\.(\w+)\s*,\s*\$(\w+)")
+
+
+def normalize_query(cypher: str) -> str:
+    """Forma de la query: sin espacios redundantes (los parámetros ya van aparte)"""
+    return " ".join(cypher.split())
+
+
+def _clean_params(kwargs: Dict) -> Dict:
+    """Quita las opciones del driver (sufijo '_') y aplana `params=`"""
+    params = dict(kwargs.get("params") or kwargs.get("parameters_") or {})
+    params.update({k: v for k, v in kwargs.items() if k not in ("params", "parameters_")})
+    return {k: v for k, v in params.items() if not k.endswith("_")}
+
+
+class QueryRecorder:
+    """Registra las queries que Graphiti envía al driver, agrupadas por forma"""
+
+    def __init__(self):
+        self.shapes: Dict[str, Dict] = {}
+
+    def record(self, cypher: str, params: Dict, elapsed: float, source: str):
+        shape = normalize_query(cypher)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = {
+                "id": hashlib.sha1(shape.encode("utf-8")).hexdigest()[:10],
+                "query": shape,
+                "sample_params": params,
+                "calls": 0,
+                "total_time_s": 0.0,
+                "sources": set(),
+            }
+        entry["calls"] += 1
+        entry["total_time_s"] += elapsed
+        entry["sources"].add(source)
+
+    def attach(self, graphiti):
+        """Envuelve graphiti.driver para capturar execute_query y las sesiones"""
+        driver = graphiti.driver
+        recorder = self
+        original_execute_query = driver.execute_query
+        original_session = driver.session
+
+        async def execute_query(cypher_query_, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original_execute_query(cypher_query_, **kwargs)
+            finally:
+                recorder.record(cypher_query_, _clean_params(kwargs), time.perf_counter() - start, "execute_query")
+
+        def session(*args, **kwargs):
+            return _RecordingSession(original_session(*args, **kwargs), recorder)
+
+        driver.execute_query = execute_query
+        driver.session = session
+        return self
+
+
+class _RecordingTransaction:
+    def __init__(self, tx, recorder: QueryRecorder):
+        self._tx = tx
+        self._recorder = recorder
+
+    async def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {})
+        params.update(kwargs)
+        start = time.perf_counter()
+        try:
+            return await self._tx.run(query, parameters, **kwargs)
+        finally:
+            self._recorder.record(query, _clean_params(params), time.perf_counter() - start, "session")
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+class _RecordingSession:
+    def __init__(self, session, recorder: QueryRecorder):
+        self._session = session
+        self._recorder = recorder
+
+    async def __aenter__(self):
+        await self._session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._session.__aexit__(*exc)
+
+    async def run(self, query, parameters=None, **kwargs):
+        return await _RecordingTransaction(self._session, self._recorder).run(query, parameters, **kwargs)
+
+    async def execute_write(self, fn, *args, **kwargs):
+        async def wrapped(tx, *a, **kw):
+            return await fn(_RecordingTransaction(tx, self._recorder), *a, **kw)
+        return await self._session.execute_write(wrapped, *args, **kwargs)
+
+    async def execute_read(self, fn, *args, **kwargs):
+        async def wrapped(tx, *a, **kw):
+            return await fn(_RecordingTransaction(tx, self._recorder), *a, **kw)
+        return await self._session.execute_read(wrapped, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+# --- Profiling ---
+
+def _operator_name(plan: Dict) -> str:
+    return (plan.get("operatorType") or "").split("@")[0]
+
+
+def _walk_plan(plan: Dict) -> List[Dict]:
+    operators = [plan]
+    for child in plan.get("children", []):
+        operators.extend(_walk_plan(child))
+    return operators
+
+
+def profile_query(session, cypher: str, params: Dict) -> Dict:
+    """Ejecuta PROFILE en una transacción que se revierte y resume el plan"""
+    tx = session.begin_transaction()
+    try:
+        summary = tx.run(f"PROFILE {cypher}", params).consume()
+    finally:
+        tx.rollback()
+    plan = summary.profile or {}
+    operators = _walk_plan(plan)
+    names = [_operator_name(op) for op in operators]
+    index_details = [
+        op.get("args", {}).get("Details", "")
+        for op in operators if "Index" in _operator_name(op)
+    ]
+    return {
+        "db_hits": sum(op.get("dbHits", 0) for op in operators),
+        "rows": plan.get("rows", 0),
+        "operators": sorted(set(names)),
+        "index_operators": index_details,
+        "scans": sorted(set(names) & SCAN_OPERATORS),
+    }
+
+
+def _variable_labels(cypher: str) -> Dict[str, tuple]:
+    """Mapea variable -> (label, es_relación) a partir de los patrones MATCH/MERGE"""
+    variables = {}
+    for var, label, _ in _NODE_PATTERN.findall(cypher):
+        variables.setdefault(var, (label, False))
+    for var, label, _ in _REL_PATTERN.findall(cypher):
+        variables.setdefault(var, (label, True))
+    return variables
+
+
+def _has_index(existing: List[Dict], label: str, prop: str, index_type: Optional[str] = None) -> bool:
+    for index in existing:
+        if index_type and index["type"] != index_type:
+            continue
+        if label in (index["labelsOrTypes"] or []) and (index["properties"] or [])[:1] == [prop]:
+            return True
+    return False
+
+
+def _lookup_predicates(cypher: str) -> List[tuple]:
+    """(label, propiedad, es_relación) usados para ubicar nodos/relaciones"""
+    variables = _variable_labels(cypher)
+    predicates = set()
+    for pattern in (_NODE_PATTERN, _REL_PATTERN):
+        for var, label, props in pattern.findall(cypher):
+            for prop in re.findall(r"(\w+)\s*:", props or ""):
+                predicates.add((label, prop, pattern is _REL_PATTERN))
+    for var, prop in _WHERE_PREDICATE.findall(cypher):
+        if var in variables:
+            label, is_rel = variables[var]
+            predicates.add((label, prop, is_rel))
+    return sorted(predicates)
+
+
+def recommend_indexes(shape: Dict, existing: List[Dict]) -> List[str]:
+    """Recomendaciones de índices para una forma de query ya perfilada"""
+    cypher = shape["query"]
+    profile = shape.get("profile") or {}
+    recommendations = []
+    expected_by_name = {d["name"]: d for d in INDEX_DEFINITIONS}
+    existing_by_name = {index["name"]: index for index in existing}
+
+    # Fulltext: el índice consultado debe existir, estar ONLINE y cubrir lo que espera Graphiti
+    for _, index_name in _FULLTEXT_CALL.findall(cypher):
+        index = existing_by_name.get(index_name)
+        expected = expected_by_name.get(index_name)
+        if index is None:
+            statement = create_statement(expected) if expected else f"-- definir índice fulltext '{index_name}'"
+            recommendations.append(f"Falta el índice fulltext '{index_name}': {statement}")
+        elif index["state"] != "ONLINE":
+            recommendations.append(f"El índice '{index_name}' está en estado {index['state']}.")
+        elif expected and not matches_definition(index, expected):
+            recommendations.append(
+                f"El índice '{index_name}' cubre {index['labelsOrTypes']} {index['properties']} pero Graphiti "
+                f"consulta {expected['label']} {expected['properties']}: DROP INDEX {index_name}; "
+                f"{create_statement(expected)}"
+            )
+
+    # Range: solo si el plan muestra scans por label/tipo o de todos los nodos
+    if profile.get("scans"):
+        for label, prop, is_rel in _lookup_predicates(cypher):
+            if _has_index(existing, label, prop, RANGE):
+                continue
+            # Se prefiere la definición del proyecto si ya contempla ese label/propiedad
+            definition = next(
+                (d for d in INDEX_DEFINITIONS
+                 if d["type"] == RANGE and d["label"] == label and d["properties"][0] == prop),
+                {"name": f"{label.lower()}_{prop}", "type": RANGE, "relationship": is_rel,
+                 "label": label, "properties": [prop]}
+            )
+            statement = create_statement(definition)
+            recommendations.append(f"Scan sin índice sobre {label}.{prop} ({', '.join(profile['scans'])}): {statement}")
+
+    # Vector: Graphiti en Neo4j calcula la similitud por fuerza bruta
+    for var, prop, param in _VECTOR_SIMILARITY.findall(cypher):
+        label, is_rel = _variable_labels(cypher).get(var, (None, False))
+        if label is None or _has_index(existing, label, prop, "VECTOR"):
+            continue
+        vector = shape["sample_params"].get(param)
+        dimensions = len(vector) if isinstance(vector, (list, tuple)) else "<dimensiones>"
+        pattern = f"()-[r:{label}]-()" if is_rel else f"(n:{label})"
+        target = "r" if is_rel else "n"
+        procedure = "db.index.vector.queryRelationships" if is_rel else "db.index.vector.queryNodes"
+        recommendations.append(
+            f"Similitud vectorial por fuerza bruta sobre {label}.{prop}: "
+            f"CREATE VECTOR INDEX {label.lower()}_{prop} IF NOT EXISTS FOR {pattern} ON ({target}.{prop}) "
+            f"OPTIONS {{indexConfig: {{`vector.dimensions`: {dimensions}, `vector.similarity_function`: 'cosine'}}}} "
+            f"(requiere consultar con {procedure} para aprovecharlo)"
+        )
+    return recommendations
+
+
+def compare_with_baseline(shapes: List[Dict], baseline: Dict) -> List[str]:
+    """Regresiones de plan respecto de un reporte anterior"""
+    previous = {shape["id"]: shape for shape in baseline.get("shapes", [])}
+    regressions = []
+    for shape in shapes:
+        before = previous.get(shape["id"])
+        profile = shape.get("profile")
+        if before is None or not profile or not before.get("profile"):
+            continue
+        old = before["profile"]
+        if old["db_hits"] and profile["db_hits"] > old["db_hits"] * DB_HITS_REGRESSION_RATIO:
+            regressions.append(f"[{shape['id']}] db hits {old['db_hits']} -> {profile['db_hits']}")
+        lost_indexes = set(old["index_operators"]) - set(profile["index_operators"])
+        if lost_indexes:
+            regressions.append(f"[{shape['id']}] dejó de usar: {', '.join(sorted(lost_indexes))}")
+        new_scans = set(profile["scans"]) - set(old["scans"])
+        if new_scans:
+            regressions.append(f"[{shape['id']}] nuevos scans: {', '.join(sorted(new_scans))}")
+    return regressions
+
+
+def build_report(recorder: QueryRecorder, neo4j_driver, database: Optional[str] = None) -> Dict:
+    """Perfila cada forma capturada y arma el reporte con recomendaciones"""
+    shapes = []
+    with neo4j_driver.session(database=database) as session:
+        existing = load_existing_indexes(session)
+        for entry in recorder.shapes.values():
+            shape = dict(entry)
+            shape["sources"] = sorted(entry["sources"])
+            shape["avg_time_s"] = round(entry["total_time_s"] / entry["calls"], 4)
+            try:
+                shape["profile"] = profile_query(session, entry["query"], entry["sample_params"])
+                shape["error"] = None
+            except Exception as e:
+                shape["profile"] = None
+                shape["error"] = str(e)
+            shape["recommendations"] = recommend_indexes(shape, existing)
+            # Los parámetros (embeddings incluidos) solo se usan para perfilar
+            del shape["sample_params"]
+            shapes.append(shape)
+    shapes.sort(key=lambda s: (s["profile"] or {}).get("db_hits", 0), reverse=True)
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "existing_indexes": existing,
+        "shapes": shapes,
+    }
+
+
+def print_report(report: Dict, regressions: List[str]):
+    print("=" * 60)
+    print(f"Formas de query capturadas: {len(report['shapes'])}")
+    print("=" * 60)
+    for shape in report["shapes"]:
+        profile = shape["profile"]
+        print(f"[{shape['id']}] {shape['calls']} llamadas, {shape['avg_time_s']}s promedio ({', '.join(shape['sources'])})")
+        print(f"  {shape['query'][:160]}{'...' if len(shape['query']) > 160 else ''}")
+        if profile:
+            print(f"  db hits: {profile['db_hits']}, filas: {profile['rows']}, índices: {profile['index_operators'] or 'ninguno'}")
+            if profile["scans"]:
+                print(f"  ⚠️ scans: {', '.join(profile['scans'])}")
+        else:
+            print(f"  ❌ No se pudo perfilar: {shape['error']}")
+        for recommendation in shape["recommendations"]:
+            print(f"  → {recommendation}")
+    if regressions:
+        print("=" * 60)
+        print("Regresiones de plan:")
+        for regression in regressions:
+            print(f"  ❌ {regression}")
+
+
+async def _capture(connector, searches: List[str], ingest_files: List[Path], group_id: str) -> QueryRecorder:
+    from graphiti_core.nodes import EpisodeType
+
+    recorder = QueryRecorder().attach(connector.graphiti)
+    for query in searches:
+        print(f"Buscando: {query}")
+        await connector.graphiti.search(query=query, num_results=10)
+    for path in ingest_files:
+        print(f"Ingestando en el grupo temporal '{group_id}': {path}")
+        with open(path, "r", encoding="utf-8") as file:
+            body = file.read().strip()
+        await connector.graphiti.add_episode(
+            name=f"profile_{path.stem}",
+            episode_body=body,
+            source=EpisodeType.text,
+            source_description="Episodio de profiling de queries",
+            reference_time=datetime.now(timezone.utc),
+            group_id=group_id
+        )
+    return recorder
+
+
+def _to_json(value):
+    if isinstance(value, set):
+        return sorted(value)
+    return str(value)
+
+
+def main():
+    """Punto de entrada del profiler"""
+    parser = argparse.ArgumentParser(description="Profiling de queries Cypher y asesor de índices.")
+    parser.add_argument("--search", action="append", default=[], help="Consulta de búsqueda a perfilar")
+    parser.add_argument("--ingest", action="append", default=[], type=Path, help="Archivo de texto a ingestar como episodio en un grupo temporal que se borra al terminar")
+    parser.add_argument("--output", type=Path, default=Path("data/output/query_profile.json"))
+    parser.add_argument("--baseline", type=Path, default=None, help="Reporte anterior para detectar regresiones")
+    args = parser.parse_args()
+
+    if not args.search and not args.ingest:
+        args.search = ["TechNova CEO", "productos de TechNova"]
+
+    from src.config.config_azure import GraphitiConnector
+
+    connector = GraphitiConnector()
+    group_id = f"query_profile_{uuid.uuid4().hex[:8]}"
+
+    async def capture():
+        from graphiti_core.utils.maintenance.graph_data_operations import clear_data
+
+        try:
+            recorder = await _capture(connector, args.search, args.ingest, group_id)
+            # El reporte se arma antes de borrar el grupo para que los parámetros capturados sigan apuntando a datos reales
+            return await asyncio.to_thread(build_report, recorder, connector.neo4j_driver, connector.neo4j_database)
+        finally:
+            if args.ingest:
+                await clear_data(connector.graphiti.driver, group_ids=[group_id])
+                print(f"Grupo temporal '{group_id}' eliminado del grafo.")
+            await connector.graphiti.close()
+
+    report = asyncio.run(capture())
+
+    regressions = []
+    if args.baseline and args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(report["shapes"], json.load(f))
+    report["regressions"] = regressions
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=_to_json)
+    print_report(report, regressions)
+    print(f"Reporte guardado en {args.output}")
+    connector.neo4j_driver.close()
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import asyncio
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List
 import re
 
 from graphiti_core.nodes import EpisodeType
@@ -11,54 +11,106 @@ from src.config.config_azure import GraphitiConnector
 input_dir = Path("data/output/tech_nova_extracted.txt")
 output_dir = Path("data/output_episodes/")
 
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Largo máximo de una oración antes de cortarla como episodio propio: las tablas en
+# Markdown de Docling no tienen puntuación final y, sin este tope, acumularían páginas
+MAX_SENTENCE_CHARS = 4000
+
+
+def _is_valid_sentence(sentence: str) -> bool:
+    return bool(sentence.strip()) and len(sentence) > 2
+
+
+def iter_sentence_pairs(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Versión incremental de chunk_text_by_sentence_pairs: consume el texto por fragmentos
+    (ej: líneas de un archivo) y emite cada episodio de dos oraciones apenas se completa.
+    Cada fragmento se escanea una sola vez y la oración en curso se acota a
+    MAX_SENTENCE_CHARS: si se supera, se emite sola como episodio.
+    """
+    pending = None
+    parts: List[str] = []  # fragmentos de la oración en curso
+    size = 0
+    last_char = ""  # el lookbehind del separador necesita el carácter anterior al fragmento
+
+    def pair(sentence: str) -> Iterator[str]:
+        nonlocal pending
+        sentence = sentence.strip()
+        if not _is_valid_sentence(sentence):
+            return
+        if pending is None:
+            pending = sentence
+        else:
+            yield f"{pending} {sentence}"
+            pending = None
+
+    for chunk in chunks:
+        for offset in range(0, len(chunk), MAX_SENTENCE_CHARS):
+            piece = chunk[offset:offset + MAX_SENTENCE_CHARS]
+            text = last_char + piece
+            start = 0
+            for match in SENTENCE_BOUNDARY.finditer(text):
+                parts.append(piece[start:match.start() - len(last_char)])
+                yield from pair("".join(parts))
+                parts, size = [], 0
+                start = match.end() - len(last_char)
+            parts.append(piece[start:])
+            size += len(piece) - start
+            last_char = piece[-1]
+
+            if size >= MAX_SENTENCE_CHARS:
+                # Texto sin separadores (ej: tablas): se corta como episodio propio
+                oversized = "".join(parts).strip()
+                parts, size = [], 0
+                if pending is not None:
+                    yield pending
+                    pending = None
+                if _is_valid_sentence(oversized):
+                    yield oversized
+
+    last = "".join(parts).strip()
+    if _is_valid_sentence(last):
+        if pending is None:
+            yield last
+        else:
+            yield f"{pending} {last}"
+    elif pending is not None:
+        yield pending
+
+
+def iter_episodes_from_file(path: Path) -> Iterator[str]:
+    """Lee el archivo línea por línea y genera los episodios sin cargarlo completo"""
+    with open(path, "r", encoding="utf-8") as file:
+        yield from iter_sentence_pairs(file)
+
+
 def chunk_text_by_sentence_pairs(text: str) -> List[str]:
     """
     Divide el texto en episodios, donde cada episodio contiene exactamente dos oraciones
     terminadas en punto. Usa regex para detectar oraciones.
     """
-    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip() and len(s) > 2]
-    episodes = []
-    for i in range(0, len(sentences) - 1, 2):
-        episode = " ".join(sentences[i:i+2])
-        if episode.strip():
-            episodes.append(episode)
-    if len(sentences) % 2 == 1:
-        last_episode = sentences[-1]
-        if last_episode.strip():
-            episodes.append(last_episode)
-    return episodes
+    return list(iter_sentence_pairs([text.strip()]))
 
 async def add_episodes_to_graphiti(input_dir: Path):
     """
     Lee el archivo, lo divide en episodios (dos oraciones por episodio), y los agrega a Graphiti.
+    El archivo se consume como stream: cada episodio se agrega y se guarda apenas se genera.
     """
+    graphiti = None
     try:
         # Usa la instancia de Graphiti
         connector = GraphitiConnector()
         graphiti = connector.graphiti
 
-        # Lee el contenido
-        with open(input_dir, "r", encoding="utf-8") as file:
-            full_text = file.read().strip()
-
-        if not full_text:
-            print("El archivo está vacío.")
-            return
-
-        # Divide en episodios
-        episodes_text = chunk_text_by_sentence_pairs(full_text)
-        if not episodes_text:
-            print("No se encontraron episodios válidos.")
-            return
-
-        print(f"Se generaron {len(episodes_text)} episodios.")
-
         # Prepara metadatos
         source_description = "Extracto de PDF Tech Nova, dividido en pares de oraciones"
         reference_time = datetime.now(timezone.utc)
+        output_dir.mkdir(parents=True, exist_ok=True)
 
         input_name = input_dir.stem.replace('_extracted', '')
-        for i, episode_text in enumerate(episodes_text, 1):
+        total = 0
+        for i, episode_text in enumerate(iter_episodes_from_file(input_dir), 1):
             episode_name = f"{input_name}_episode_{i}"
             await graphiti.add_episode(
                 name=episode_name,
@@ -68,16 +120,19 @@ async def add_episodes_to_graphiti(input_dir: Path):
                 reference_time=reference_time
             )
             print(f"Agregado episodio: {episode_name} ({EpisodeType.text.value})")
-            await asyncio.sleep(1)
-
-        print(f"Se agregaron {len(episodes_text)} episodios al grafo.")
 
-        # Guarda episodios como archivos
-        output_dir.mkdir(parents=True, exist_ok=True)
-        for i, episode_text in enumerate(episodes_text, 1):
+            # Guarda el episodio como archivo
             chunk_file = output_dir / f"episode_{i}.txt"
             with open(chunk_file, "w", encoding="utf-8") as f:
                 f.write(episode_text)
+            total = i
+            await asyncio.sleep(1)
+
+        if total == 0:
+            print("No se encontraron episodios válidos.")
+            return
+
+        print(f"Se agregaron {total} episodios al grafo.")
         print("Episodios guardados en data/output_episodes/episode_*.txt")
 
     except FileNotFoundError:
@@ -85,8 +140,9 @@ async def add_episodes_to_graphiti(input_dir: Path):
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        await graphiti.close()
-        print("Conexión cerrada.")
+        if graphiti is not None:
+            await graphiti.close()
+            print("Conexión cerrada.")
 
 if __name__ == "__main__":
-    asyncio.run(add_episodes_to_graphiti(input_dir))
\ No newline at end of file
+    asyncio.run(add_episodes_to_graphiti(input_dir))
@@ -0,0 +1,40 @@
+"""
+Construye los resúmenes de comunidades del grafo con Graphiti
+
+Agrupa las entidades en comunidades (label propagation de Graphiti) y genera un resumen
+por comunidad a partir de los resúmenes de sus miembros. Los nodos :Community quedan en
+Neo4j unidos a sus entidades con HAS_MEMBER y los consulta la herramienta
+`community_overview` del agente en una sola lectura.
+
+Se ejecuta al final del pipeline de ingestión o de forma programada:
+    python -m src.datapipeline.build_communities
+"""
+import asyncio
+from typing import List, Optional
+
+from src.config.config_azure import GraphitiConnector
+
+
+async def build_community_summaries(graphiti=None, group_ids: Optional[List[str]] = None) -> int:
+    """
+    Reconstruye las comunidades y sus resúmenes (Graphiti elimina las anteriores).
+    Devuelve la cantidad de comunidades generadas.
+    """
+    connector = None
+    if graphiti is None:
+        connector = GraphitiConnector()
+        graphiti = connector.graphiti
+    try:
+        result = await graphiti.build_communities(group_ids=group_ids)
+        # Según la versión de graphiti-core devuelve solo los nodos o (nodos, edges)
+        community_nodes = result[0] if isinstance(result, tuple) else result
+        print(f"Se generaron {len(community_nodes)} comunidades.")
+        return len(community_nodes)
+    finally:
+        if connector is not None:
+            await graphiti.close()
+            print("Conexión cerrada.")
+
+
+if __name__ == "__main__":
+    asyncio.run(build_community_summaries())
@@ -1,5 +1,12 @@
-from docling.document_converter import DocumentConverter
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator, Optional
+
+import pypdfium2 as pdfium
+from docling.document_converter import DocumentConverter
 
 # Ruta al archivo PDF
 pdf_path = Path("data/pdfs/tech_nova.pdf")
@@ -7,33 +14,102 @@ pdf_path = Path("data/pdfs/tech_nova.pdf")
 # Ruta al archivo de salida
 output_text_path = Path("data/output/tech_nova_extracted.txt")
 
-def extract_text_from_pdf(pdf_path: Path, output_text_path: Path):
+# Páginas convertidas por lote y procesos en paralelo. El pico de memoria depende del
+# tamaño del lote (y de la cantidad de procesos), no del tamaño total del documento.
+PAGES_PER_BATCH = int(os.getenv("PDF_PAGES_PER_BATCH", "20"))
+EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", "1"))
+
+# Convertidor por proceso: se inicializa una vez y se reutiliza entre lotes
+_converter: Optional[DocumentConverter] = None
+
+
+def _get_converter() -> DocumentConverter:
+    global _converter
+    if _converter is None:
+        _converter = DocumentConverter()
+    return _converter
+
+
+def get_page_count(pdf_path: Path) -> int:
+    """Cantidad de páginas del PDF (sin convertirlo)"""
+    document = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def _convert_page_range(pdf_path: str, start_page: int, end_page: int) -> str:
+    """Convierte un rango de páginas (1-based, inclusivo) a Markdown"""
+    result = _get_converter().convert(pdf_path, page_range=(start_page, end_page))
+    return result.document.export_to_markdown()
+
+
+def iter_pdf_markdown(
+    pdf_path: Path,
+    pages_per_batch: int = PAGES_PER_BATCH,
+    workers: int = EXTRACTION_WORKERS,
+) -> Iterator[str]:
+    """
+    Genera el Markdown del PDF por lotes de páginas, en orden. Con workers > 1 los lotes
+    se convierten en procesos separados, con a lo sumo 2 lotes por proceso en vuelo.
+    """
+    page_count = get_page_count(pdf_path)
+    ranges = [
+        (start, min(start + pages_per_batch - 1, page_count))
+        for start in range(1, page_count + 1, pages_per_batch)
+    ]
+
+    if workers <= 1:
+        for start, end in ranges:
+            yield _convert_page_range(str(pdf_path), start, end)
+        return
+
+    # spawn: el proceso que llama tiene hilos (asyncio.to_thread, driver de Neo4j) y fork
+    # podría copiar locks tomados a los hijos
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(_convert_page_range, str(pdf_path), start, end))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def extract_text_from_pdf(
+    pdf_path: Path,
+    output_text_path: Path,
+    pages_per_batch: int = PAGES_PER_BATCH,
+    workers: int = EXTRACTION_WORKERS,
+):
     """
     Extrae texto de un PDF usando Docling y lo guarda en un archivo de texto (en formato Markdown).
+    La conversión se hace por lotes de páginas y cada lote se escribe apenas termina,
+    así el documento completo nunca está en memoria.
     """
     try:
-        # Inicializa el convertidor de Docling
-        converter = DocumentConverter()
-
-        # Convierte el PDF (puede ser una ruta local o URL)
-        result = converter.convert(str(pdf_path))
-        
-        # Obtiene el documento procesado
-        document = result.document
-        
-        # Exporta a Markdown (preserva estructura; usa export_to_dict() para JSON o ajusta para texto plano)
-        extracted_text = document.export_to_markdown()
-
-        # Guarda en un archivo de texto
+        preview = ""
+        pages = get_page_count(pdf_path)
+        print(f"Convirtiendo {pages} páginas en lotes de {pages_per_batch} ({workers} procesos)...")
+
         with open(output_text_path, "w", encoding="utf-8") as text_file:
-            text_file.write(extracted_text)
+            for i, markdown in enumerate(iter_pdf_markdown(pdf_path, pages_per_batch, workers)):
+                if i > 0:
+                    text_file.write("\n\n")
+                text_file.write(markdown)
+                text_file.flush()
+                if len(preview) < 500:
+                    preview += markdown[:500 - len(preview)]
 
         print(f"Texto extraído exitosamente a {output_text_path}")
         print("Vista previa del texto extraído:")
-        print(extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text)
-        
+        print(preview + "..." if len(preview) >= 500 else preview)
+
     except Exception as e:
+        # No se deja un archivo parcial que luego se ingeste como si estuviera completo
+        Path(output_text_path).unlink(missing_ok=True)
         print(f"Ocurrió un error: {e}")
 
 if __name__ == "__main__":
-    extract_text_from_pdf(pdf_path, output_text_path)
\ No newline at end of file
+    extract_text_from_pdf(pdf_path, output_text_path)
@@ -0,0 +1,210 @@
+"""
+Worker de ingestión en segundo plano
+
+Consume la cola persistente (job_queue.IngestionQueue) mientras el agente sigue
+respondiendo. La concurrencia se ajusta según la latencia reciente del chatbot:
+si el p95 interactivo supera el objetivo se reduce a la mitad, y si supera el doble
+del objetivo la ingestión se pausa hasta que la latencia se recupere.
+
+Uso:
+    python -m src.datapipeline.ingestion_worker enqueue data/pdfs/tech_nova.pdf --priority 5
+    python -m src.datapipeline.ingestion_worker status
+    python -m src.datapipeline.ingestion_worker work --concurrency 2 --drain
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from graphiti_core.nodes import EpisodeType
+from src.datapipeline.add_episodes import iter_episodes_from_file
+from src.datapipeline.job_queue import IngestionQueue
+
+# Latencia objetivo (segundos) del p95 interactivo antes de frenar la ingestión
+DEFAULT_TARGET_LATENCY = float(os.getenv("INGESTION_TARGET_LATENCY", "15"))
+
+# Mínimo de muestras para considerar la latencia interactiva
+MIN_LATENCY_SAMPLES = 3
+
+# Cada cuántos segundos se renueva un documento en proceso; debe ser bastante menor
+# que el umbral de requeue_stale para que otro worker no lo tome por abandonado
+HEARTBEAT_INTERVAL = 60
+
+
+class IngestionWorker:
+    """Drena la cola de ingestión con concurrencia acotada y adaptativa"""
+
+    def __init__(
+        self,
+        queue: IngestionQueue,
+        graphiti,
+        concurrency: int = 2,
+        target_latency: float = DEFAULT_TARGET_LATENCY,
+        poll_interval: float = 2.0,
+    ):
+        self.queue = queue
+        self.graphiti = graphiti
+        self.concurrency = concurrency
+        self.target_latency = target_latency
+        self.poll_interval = poll_interval
+        self._active = set()
+        self._last_allowed = concurrency
+
+    def allowed_concurrency(self) -> int:
+        """Concurrencia permitida según el p95 de las últimas respuestas del agente"""
+        latencies = self.queue.recent_latencies()
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return self.concurrency
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        if p95 <= self.target_latency:
+            allowed = self.concurrency
+        elif p95 <= 2 * self.target_latency:
+            allowed = max(1, self.concurrency // 2)
+        else:
+            allowed = 0
+        if allowed != self._last_allowed:
+            print(f"Ingestión: p95 interactivo {p95:.1f}s, concurrencia {self._last_allowed} -> {allowed}")
+            self._last_allowed = allowed
+        return allowed
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None, drain: bool = False):
+        """
+        Procesa jobs hasta que se setee `stop_event`. Con `drain=True` termina cuando
+        la cola queda vacía.
+        """
+        requeued = await asyncio.to_thread(self.queue.requeue_stale)
+        if requeued:
+            print(f"Se reencolaron {requeued} jobs abandonados.")
+        stop_event = stop_event or asyncio.Event()
+        try:
+            while not stop_event.is_set():
+                job = None
+                if len(self._active) < await asyncio.to_thread(self.allowed_concurrency):
+                    job = await asyncio.to_thread(self.queue.claim)
+                if job is not None:
+                    task = asyncio.create_task(self._process(job))
+                    self._active.add(task)
+                    task.add_done_callback(self._active.discard)
+                    continue
+                if drain and not self._active and await asyncio.to_thread(self.queue.pending_count) == 0:
+                    break
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._active:
+                await asyncio.gather(*self._active, return_exceptions=True)
+
+    async def _process(self, job: dict):
+        try:
+            if job["kind"] == "document":
+                await self._process_document(job)
+            elif job["kind"] == "episode":
+                await self._process_episode(job)
+                await asyncio.to_thread(self.queue.complete, job["id"])
+            else:
+                raise ValueError(f"Tipo de job desconocido: {job['kind']}")
+        except Exception as e:
+            print(f"Error en job {job['id']} ({job['kind']}, intento {job['attempts']}): {e}")
+            await asyncio.to_thread(self.queue.fail, job["id"], str(e))
+
+    async def _process_document(self, job: dict):
+        """Extrae el texto del PDF y lo expande en jobs de episodio"""
+        # Import diferido: Docling es pesado y el chatbot solo lo necesita al procesar PDFs
+        from src.datapipeline.extract_text import extract_text_from_pdf
+
+        pdf_path = Path(job["payload"]["pdf_path"])
+        # El id del job evita que dos PDFs con el mismo nombre compartan el archivo de salida
+        output_text_path = Path("data/output") / f"{pdf_path.stem}_{job['id']}_extracted.txt"
+        output_text_path.parent.mkdir(parents=True, exist_ok=True)
+        output_text_path.unlink(missing_ok=True)
+
+        await self._with_heartbeat(job["id"], extract_text_from_pdf, pdf_path, output_text_path)
+        if not output_text_path.exists():
+            raise RuntimeError(f"No se pudo extraer texto de {pdf_path}")
+
+        # El texto se lee como stream y los episodios se insertan a medida que se generan
+        reference_time = datetime.now(timezone.utc).isoformat()
+        source_description = f"Extracto de PDF {pdf_path.stem}, dividido en pares de oraciones"
+        episodes = (
+            {
+                "name": f"{pdf_path.stem}_episode_{i}",
+                "episode_body": episode_text,
+                "source_description": source_description,
+                "reference_time": reference_time,
+            }
+            for i, episode_text in enumerate(iter_episodes_from_file(output_text_path), 1)
+        )
+        count = await self._with_heartbeat(
+            job["id"], self.queue.expand_document, job["id"], episodes, job["priority"], job["max_attempts"]
+        )
+        print(f"Documento {pdf_path} encolado en {count} episodios.")
+
+    async def _with_heartbeat(self, job_id: int, func, *args):
+        """Ejecuta `func` en un thread renovando el job cada HEARTBEAT_INTERVAL segundos"""
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=HEARTBEAT_INTERVAL)
+            if done:
+                return task.result()
+            await asyncio.to_thread(self.queue.heartbeat, job_id)
+
+    async def _process_episode(self, job: dict):
+        payload = job["payload"]
+        await self.graphiti.add_episode(
+            name=payload["name"],
+            episode_body=payload["episode_body"],
+            source=EpisodeType.text,
+            source_description=payload["source_description"],
+            reference_time=datetime.fromisoformat(payload["reference_time"])
+        )
+        print(f"Agregado episodio: {payload['name']}")
+
+
+async def _work(concurrency: int, drain: bool):
+    from src.config.config_azure import GraphitiConnector
+
+    connector = GraphitiConnector()
+    try:
+        worker = IngestionWorker(IngestionQueue(), connector.graphiti, concurrency=concurrency)
+        await worker.run(drain=drain)
+    finally:
+        await connector.graphiti.close()
+        print("Conexión cerrada.")
+
+
+def main():
+    """Punto de entrada de la cola de ingestión"""
+    parser = argparse.ArgumentParser(description="Cola de ingestión en segundo plano.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Encola uno o más PDFs")
+    enqueue_parser.add_argument("pdfs", nargs="+", type=Path)
+    enqueue_parser.add_argument("--priority", type=int, default=0)
+    enqueue_parser.add_argument("--max-attempts", type=int, default=3)
+
+    subparsers.add_parser("status", help="Muestra el progreso de la cola")
+
+    work_parser = subparsers.add_parser("work", help="Procesa la cola")
+    work_parser.add_argument("--concurrency", type=int, default=2)
+    work_parser.add_argument("--drain", action="store_true", help="Termina cuando la cola queda vacía")
+
+    args = parser.parse_args()
+    queue = IngestionQueue()
+    if args.command == "enqueue":
+        for pdf in args.pdfs:
+            job_id = queue.enqueue_document(pdf, args.priority, args.max_attempts)
+            print(f"Encolado {pdf} (job {job_id}, prioridad {args.priority})")
+    elif args.command == "status":
+        print(json.dumps(queue.status(), ensure_ascii=False, indent=2))
+    elif args.command == "work":
+        asyncio.run(_work(args.concurrency, args.drain))
+
+
+if __name__ == "__main__":
+    main()
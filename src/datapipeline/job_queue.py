@@ -0,0 +1,370 @@
+"""
+Cola persistente de jobs de ingestión (SQLite local)
+
+Guarda documentos y episodios pendientes con prioridad, reintentos y estado, y registra
+las latencias de las respuestas interactivas del agente para que los workers de
+ingestión puedan frenarse cuando el chatbot se degrada. Al ser un archivo SQLite,
+la cola y las métricas se comparten entre el proceso del chatbot y workers separados.
+"""
+import json
+import sqlite3
+import time
+from contextlib import closing
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_DB_PATH = Path("data/ingestion_queue.db")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Episodios insertados por transacción al expandir un documento: acota cuánto
+# tiempo se retiene el lock de escritura de SQLite mientras se genera el chunking
+EXPAND_BATCH_SIZE = 500
+
+# Ventana (segundos) de latencias interactivas consideradas para el throttling
+LATENCY_WINDOW_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    parent_id INTEGER,
+    error TEXT,
+    not_before REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_parent ON jobs (parent_id, status);
+CREATE TABLE IF NOT EXISTS interactive_latency (
+    ts REAL NOT NULL,
+    latency REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS interactive_latency_ts ON interactive_latency (ts);
+"""
+
+
+class IngestionQueue:
+    """Cola de jobs de ingestión con prioridades, reintentos y progreso"""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, retry_backoff_seconds: float = 30.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.retry_backoff_seconds = retry_backoff_seconds
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # --- Encolado ---
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict,
+        priority: int = 0,
+        max_attempts: int = 3,
+        parent_id: Optional[int] = None,
+    ) -> int:
+        """Agrega un job a la cola y devuelve su id. Mayor prioridad se procesa antes."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO jobs (kind, payload, priority, max_attempts, parent_id, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (kind, json.dumps(payload, ensure_ascii=False), priority, max_attempts, parent_id, now, now)
+            )
+            return cursor.lastrowid
+
+    def enqueue_document(self, pdf_path: Path, priority: int = 0, max_attempts: int = 3) -> int:
+        """Encola un PDF; al procesarse se expande en jobs de episodio"""
+        return self.enqueue("document", {"pdf_path": str(pdf_path)}, priority, max_attempts)
+
+    def enqueue_episode(
+        self,
+        name: str,
+        episode_body: str,
+        source_description: str,
+        reference_time: str,
+        priority: int = 0,
+        max_attempts: int = 3,
+        parent_id: Optional[int] = None,
+    ) -> int:
+        """Encola un episodio individual para graphiti.add_episode"""
+        payload = {
+            "name": name,
+            "episode_body": episode_body,
+            "source_description": source_description,
+            "reference_time": reference_time,
+        }
+        return self.enqueue("episode", payload, priority, max_attempts, parent_id)
+
+    # --- Consumo ---
+
+    def claim(self) -> Optional[Dict]:
+        """
+        Toma atómicamente el próximo job pendiente (mayor prioridad, luego FIFO). Los
+        episodios de un mismo documento se procesan en orden, de a uno por vez, para
+        que Graphiti resuelva la temporalidad sobre los episodios anteriores: solo se
+        puede tomar el primer episodio del documento que todavía no está 'done', así
+        un episodio en reintento bloquea a los siguientes hasta completarse.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status = ? AND not_before <= ?
+                  AND (parent_id IS NULL OR id = (
+                      SELECT MIN(sibling.id) FROM jobs AS sibling
+                      WHERE sibling.parent_id = jobs.parent_id AND sibling.status != ?
+                  ))
+                ORDER BY priority DESC, id
+                LIMIT 1
+                """,
+                (PENDING, now, DONE)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job_id: int):
+        self._set_status(job_id, DONE, None)
+        self._complete_parent_if_finished(job_id)
+
+    def fail(self, job_id: int, error: str):
+        """
+        Marca el fallo; si quedan intentos vuelve a pendiente con backoff exponencial.
+        Si un episodio falla definitivamente, los episodios siguientes del mismo documento
+        también se marcan como fallidos: ingestarlos sin él rompería el orden temporal.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, parent_id FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return
+            if row["attempts"] < row["max_attempts"]:
+                delay = self.retry_backoff_seconds * 2 ** (row["attempts"] - 1)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, not_before = ?, updated_at = ? WHERE id = ?",
+                    (PENDING, error, now + delay, now, job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (FAILED, error, now, job_id)
+                )
+                if row["parent_id"] is not None:
+                    conn.execute(
+                        """
+                        UPDATE jobs SET status = ?, error = ?, updated_at = ?
+                        WHERE parent_id = ? AND id > ? AND status = ?
+                        """,
+                        (FAILED, f"Bloqueado por el episodio {job_id} fallido", now,
+                         row["parent_id"], job_id, PENDING)
+                    )
+        self._complete_parent_if_finished(job_id)
+
+    def expand_document(self, job_id: int, episodes: Iterable[Dict], priority: int = 0, max_attempts: int = 3) -> int:
+        """
+        Inserta los episodios de un documento como jobs hijos y devuelve cuántos tiene.
+        `episodes` puede ser un generador: se consume de a EXPAND_BATCH_SIZE y cada lote
+        va en su propia transacción corta, así el chunking no retiene el lock de escritura
+        y los primeros episodios se pueden procesar mientras se generan los siguientes.
+        Si un intento anterior quedó a medias, se saltean los episodios ya encolados.
+        El documento queda 'running' hasta que se marca expandido y terminan todos.
+        """
+        with closing(self._connect()) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM jobs WHERE parent_id = ?", (job_id,)).fetchone()[0]
+        episodes = islice(episodes, count, None)
+
+        while True:
+            batch = list(islice(episodes, EXPAND_BATCH_SIZE))
+            if not batch:
+                break
+            now = time.time()
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                # Un episodio que ya falló definitivamente bloquea a los siguientes: no tiene
+                # sentido seguir encolando episodios que nunca se van a poder tomar
+                blocked = conn.execute(
+                    "SELECT 1 FROM jobs WHERE parent_id = ? AND status = ? LIMIT 1", (job_id, FAILED)
+                ).fetchone()
+                if blocked:
+                    conn.execute("COMMIT")
+                    break
+                conn.executemany(
+                    """
+                    INSERT INTO jobs (kind, payload, priority, max_attempts, parent_id, created_at, updated_at)
+                    VALUES ('episode', ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (json.dumps(episode, ensure_ascii=False), priority, max_attempts, job_id, now, now)
+                        for episode in batch
+                    ]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            count += len(batch)
+
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            payload = json.loads(row["payload"])
+            payload["expanded"] = True
+            conn.execute(
+                "UPDATE jobs SET payload = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(payload, ensure_ascii=False), time.time(), job_id)
+            )
+        # Si los episodios terminaron antes de cerrar la expansión (o no hubo ninguno)
+        self._finish_document_if_done(job_id)
+        return count
+
+    def requeue_stale(self, older_than_seconds: float = 3600) -> int:
+        """
+        Devuelve a pendiente los jobs 'running' abandonados (ej: worker caído). Los
+        documentos ya expandidos siguen 'running' hasta que terminan sus episodios; los
+        que quedaron a medias se retoman desde el último episodio encolado.
+        """
+        limit = time.time() - older_than_seconds
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = ?, updated_at = ?
+                WHERE status = ? AND updated_at < ?
+                  AND (kind = 'episode' OR json_extract(payload, '$.expanded') IS NULL)
+                """,
+                (PENDING, time.time(), RUNNING, limit)
+            )
+            return cursor.rowcount
+
+    def heartbeat(self, job_id: int):
+        """Renueva updated_at de un job en curso para que requeue_stale no lo tome por abandonado"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?",
+                (time.time(), job_id, RUNNING)
+            )
+
+    def _set_status(self, job_id: int, status: str, error: Optional[str]):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def _complete_parent_if_finished(self, job_id: int):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT parent_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is not None and row["parent_id"] is not None:
+            self._finish_document_if_done(row["parent_id"])
+
+    def _finish_document_if_done(self, parent_id: int):
+        """Cierra el documento cuando ya está expandido y no le quedan episodios en curso"""
+        with closing(self._connect()) as conn:
+            parent = conn.execute("SELECT payload FROM jobs WHERE id = ?", (parent_id,)).fetchone()
+            # Mientras se insertan lotes todavía pueden faltar episodios por encolar
+            if parent is None or not json.loads(parent["payload"]).get("expanded"):
+                return
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE parent_id = ? AND status IN (?, ?)",
+                (parent_id, PENDING, RUNNING)
+            ).fetchone()[0]
+            if pending == 0:
+                failed = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE parent_id = ? AND status = ?",
+                    (parent_id, FAILED)
+                ).fetchone()[0]
+                status = FAILED if failed else DONE
+                error = f"{failed} episodios fallaron" if failed else None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (status, error, time.time(), parent_id)
+                )
+
+    # --- Estado ---
+
+    def status(self) -> Dict:
+        """Conteo por estado y progreso de cada documento"""
+        with closing(self._connect()) as conn:
+            counts = {
+                row["status"]: row["total"]
+                for row in conn.execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status")
+            }
+            documents = []
+            for doc in conn.execute("SELECT id, payload, status, error FROM jobs WHERE kind = 'document' ORDER BY id"):
+                children = conn.execute(
+                    """
+                    SELECT COUNT(*) AS total, SUM(status = 'done') AS done, SUM(status = 'failed') AS failed
+                    FROM jobs WHERE parent_id = ?
+                    """,
+                    (doc["id"],)
+                ).fetchone()
+                documents.append({
+                    "id": doc["id"],
+                    "pdf_path": json.loads(doc["payload"]).get("pdf_path"),
+                    "status": doc["status"],
+                    "episodes_total": children["total"],
+                    "episodes_done": children["done"] or 0,
+                    "episodes_failed": children["failed"] or 0,
+                    "error": doc["error"],
+                })
+        return {"counts": counts, "documents": documents}
+
+    def pending_count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (PENDING,)).fetchone()[0]
+
+    # --- Latencia interactiva ---
+
+    def record_interactive_latency(self, latency: float):
+        """Registra la latencia de una respuesta del agente (la usa el throttling)"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT INTO interactive_latency (ts, latency) VALUES (?, ?)", (now, latency))
+            conn.execute("DELETE FROM interactive_latency WHERE ts < ?", (now - LATENCY_WINDOW_SECONDS,))
+
+    def recent_latencies(self, window_seconds: float = LATENCY_WINDOW_SECONDS) -> List[float]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT latency FROM interactive_latency WHERE ts >= ?",
+                (time.time() - window_seconds,)
+            ).fetchall()
+        return [row["latency"] for row in rows]
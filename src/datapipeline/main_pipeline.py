@@ -3,6 +3,7 @@ from pathlib import Path
 import asyncio
 from src.datapipeline.extract_text import extract_text_from_pdf
 from src.datapipeline.add_episodes import add_episodes_to_graphiti
+from src.datapipeline.build_communities import build_community_summaries
 
 
 def main(pdf_url: str):
@@ -10,6 +11,7 @@ def main(pdf_url: str):
     Orquesta el pipeline completo:
     1. Extrae el texto del PDF desde la URL usando extract_text_from_pdf.
     2. Llama a add_episodes_to_graphiti con la ruta del texto extraído.
+    3. Reconstruye los resúmenes de comunidades para las preguntas generales.
     """
     # Genera el nombre de salida en base al PDF
     pdf_path = Path(pdf_url)
@@ -24,6 +26,10 @@ def main(pdf_url: str):
     print(f"Agregando episodios desde: {output_text_path}")
     asyncio.run(add_episodes_to_graphiti(output_text_path))
 
+    # Paso 3: Precomputar resúmenes de comunidades
+    print("Construyendo resúmenes de comunidades...")
+    asyncio.run(build_community_summaries())
+
 
 if __name__ == "__main__":
     if len(sys.argv) > 1: